@@ -3,26 +3,35 @@
 """
 
 import sys
+import os
 import collections
+import concurrent.futures
 import threading
 import copy
 
 import ccobra
 import mreasoner
 import numpy as np
+import scipy.optimize as so
 
 import time
+import itertools
 
 import logging
 
+import create_cache
+
 logging.basicConfig(level=logging.INFO)
 
+# Maximum number of memoized (parameterization, syllogism) query results
+QUERY_CACHE_SIZE = 100000
+
 class CCobraMReasoner(ccobra.CCobraModel):
     """ mReasoner CCOBRA model implementation.
 
     """
 
-    def __init__(self, name='mReasoner', n_samples=2, fit_its=5):
+    def __init__(self, name='mReasoner', n_samples=2, fit_its=5, n_workers=1, method='grid'):
         """ Initializes the CCOBRA model by launching the interactive LISP subprocess.
 
         Parameters
@@ -35,14 +44,17 @@ class CCobraMReasoner(ccobra.CCobraModel):
             of its randomized inference processes.
 
         method : str
-            Parameter optimization technique ('grid' or 'random').
+            Parameter optimization technique ('grid' or 'evolution'). 'evolution' performs a
+            gradient-free differential evolution search which requires fewer mReasoner
+            evaluations than the exhaustive grid.
 
         fit_its : int
-            Number of iterations for the parameter optimization (grid or random). If set to 0,
-            fitting is deactivated.
+            Number of iterations for the parameter optimization (grid steps per parameter or
+            evolution generations). If set to 0, fitting is deactivated.
 
-        num_threads : int
-            Number of parallel threads to perform the parameter optimization with.
+        n_workers : int
+            Number of parallel mReasoner worker processes to perform the parameter optimization
+            with.
 
         """
 
@@ -53,11 +65,16 @@ class CCobraMReasoner(ccobra.CCobraModel):
         self.mreas_path = mreasoner.source_path()
         self.mreasoner = mreasoner.MReasoner(self.cloz.exec_path(), self.mreas_path)
 
-        self.params = copy.deepcopy(self.mreasoner.DEFAULT_PARAMS)
+        self.params = copy.deepcopy(mreasoner.DEFAULT_PARAMS)
 
         # Store instance variables
         self.n_samples = n_samples
         self.fit_its = fit_its
+        self.n_workers = min(n_workers, os.cpu_count() or 1)
+        self.method = method
+
+        # Pool of mReasoner worker processes (launched on demand)
+        self.executor = None
 
         # Initialize auxiliary variables
         self.n_pre_train_dudes = 0
@@ -65,6 +82,9 @@ class CCobraMReasoner(ccobra.CCobraModel):
         self.person_train_data = np.zeros((64, 9))
         self.history = np.zeros((64, 9))
 
+        # Memoized mReasoner predictions
+        self.query_cache = collections.OrderedDict()
+
         self.start_time = None
 
     def __deepcopy__(self, memo):
@@ -84,7 +104,8 @@ class CCobraMReasoner(ccobra.CCobraModel):
         """
 
         # Create the new instance
-        new = CCobraMReasoner(self.name, self.n_samples, self.fit_its)
+        new = CCobraMReasoner(
+            self.name, self.n_samples, self.fit_its, self.n_workers, self.method)
 
         # Copy member variables
         new.n_pre_train_dudes = self.n_pre_train_dudes
@@ -92,6 +113,7 @@ class CCobraMReasoner(ccobra.CCobraModel):
         new.person_train_data = self.person_train_data
         new.history = self.history
         new.params = self.params
+        new.query_cache = self.query_cache
 
         return new
 
@@ -110,8 +132,11 @@ class CCobraMReasoner(ccobra.CCobraModel):
 
         sys.stdout.flush()
 
-        # Terminate the mReasoner instance
+        # Terminate the mReasoner instances
         self.mreasoner.terminate()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
 
     def start_participant(self, **kwargs):
         """ Model setup method. Stores the time for use in end_participant().
@@ -187,67 +212,279 @@ class CCobraMReasoner(ccobra.CCobraModel):
 
         train_data = self.pre_train_data + self.person_train_data + history_copy
 
-        best_score = 0
-        best_param_dicts = []
-
-        for p_epsilon in np.linspace(*self.mreasoner.param_bounds[0], self.fit_its):
-            print('epsilon:', p_epsilon)
-            for p_lambda  in np.linspace(*self.mreasoner.param_bounds[1], self.fit_its):
-                print('   lambda:', p_lambda)
-                for p_omega in np.linspace(*self.mreasoner.param_bounds[2], self.fit_its):
-                    print('      omega:', p_omega)
-                    for p_sigma in np.linspace(*self.mreasoner.param_bounds[3], self.fit_its):
-                        param_dict = {
-                            'epsilon': p_epsilon,
-                            'lambda': p_lambda,
-                            'omega': p_omega,
-                            'sigma': p_sigma
-                        }
-
-                        # Generate mReasoner prediction matrix
-                        pred_mat = np.zeros((64, 9))
-                        for syl_idx, syllog in enumerate(ccobra.syllogistic.SYLLOGISMS):
-                            premises = self.syllog_to_premises(syllog)
-
-                            for _ in range(self.n_samples):
-                                # Obtain mReasoner prediction
-                                predictions = self.mreasoner.query(premises, param_dict=param_dict)
-                                for pred in predictions:
-                                    if pred in ccobra.syllogistic.RESPONSES:
-                                        pred_mat[syl_idx, ccobra.syllogistic.RESPONSES.index(pred)] += 1 / len(predictions)
-
-                        # Compare predictions with data
-                        pred_mask = (pred_mat == pred_mat.max(axis=1, keepdims=True))
-                        score = np.sum(np.mean(train_data * pred_mask, axis=1))
-
-                        if score > best_score:
-                            best_score = score
-                            best_param_dicts = [param_dict]
-                        elif score == best_score:
-                            best_param_dicts.append(param_dict)
+        if self.method == 'evolution':
+            best_param_dicts = self.fit_evolution(train_data)
+        else:
+            best_param_dicts = self.fit_grid(train_data)
 
         # Randomly select ont of the best param dicts
         self.params = best_param_dicts[int(np.random.randint(0, len(best_param_dicts)))]
         self.best_param_dicts = best_param_dicts
 
-    def syllog_to_premises(self, syllog):
-        template_quant = {
-            'A': 'All {} are {}',
-            'I': 'Some {} are {}',
-            'E': 'No {} are {}',
-            'O': 'Some {} are not {}'
-        }
-
-        template_fig = {
-            '1': [['A', 'B'], ['B', 'C']],
-            '2': [['B', 'A'], ['C', 'B']],
-            '3': [['A', 'B'], ['C', 'B']],
-            '4': [['B', 'A'], ['B', 'C']]
-        }
-
-        prem1 = template_quant[syllog[0]].format(*template_fig[syllog[-1]][0])
-        prem2 = template_quant[syllog[1]].format(*template_fig[syllog[-1]][1])
-        return [prem1, prem2]
+        self.trim_query_cache()
+
+    def fit_grid(self, train_data):
+        """ Fits mReasoner by evaluating a grid of parameterizations. Each grid point is evaluated
+        within a single mReasoner round-trip which only covers the syllogisms with training data.
+
+        Parameters
+        ----------
+        train_data : np.ndarray
+            (64, 9) matrix of response frequencies.
+
+        Returns
+        -------
+        list(dict(str, float))
+            Best parameterizations.
+
+        """
+
+        param_values = [np.linspace(*bounds, self.fit_its) for bounds in mreasoner.PARAM_BOUNDS]
+        param_dicts = [
+            dict(zip(['epsilon', 'lambda', 'omega', 'sigma'], x))
+            for x in itertools.product(*param_values)]
+
+        # Syllogisms without training data do not contribute to the score and are not queried
+        syllogs = [
+            ccobra.syllogistic.SYLLOGISMS[x] for x in np.flatnonzero(train_data.sum(axis=1) > 0)]
+
+        # Grid points are not pruned by score bounds: all responses tied for the most frequent
+        # prediction count towards the score, so a syllogism can contribute up to the sum of its
+        # weights / 9 and no tighter bound holds before mReasoner has been queried. Such bounds
+        # cannot rule out grid points early enough to save round-trips.
+
+        # Evaluate the grid in batches whose samples fit into the query cache
+        batch_size = max(1, QUERY_CACHE_SIZE // max(1, len(syllogs)))
+        scores = np.zeros(len(param_dicts))
+        for start in range(0, len(param_dicts), batch_size):
+            batch = param_dicts[start:start + batch_size]
+            self.prefetch_predictions(batch, syllogs)
+
+            pred_mats = np.array([self.prediction_matrix(x, syllogs) for x in batch])
+            scores[start:start + len(batch)] = self.score_predictions(pred_mats, train_data)
+
+        return [param_dicts[x] for x in np.flatnonzero(scores == scores.max())]
+
+    def fit_evolution(self, train_data):
+        """ Fits mReasoner by differential evolution. The objective is piecewise constant in the
+        parameters which renders gradient-based optimizers ineffective.
+
+        Parameters
+        ----------
+        train_data : np.ndarray
+            (64, 9) matrix of response frequencies.
+
+        Returns
+        -------
+        list(dict(str, float))
+            Best parameterizations.
+
+        """
+
+        def to_param_dict(x):
+            return dict(zip(['epsilon', 'lambda', 'omega', 'sigma'], x))
+
+        def objective(x):
+            pred_mat = self.prediction_matrix(to_param_dict(x))
+            return -self.score_predictions(pred_mat[np.newaxis], train_data)[0]
+
+        def population_map(func, population):
+            # Evaluate the candidates of a generation on the worker processes
+            population = list(population)
+            self.prefetch_predictions([to_param_dict(x) for x in population])
+            return list(map(func, population))
+
+        res = so.differential_evolution(
+            objective, mreasoner.PARAM_BOUNDS, maxiter=self.fit_its, popsize=8,
+            polish=False, updating='deferred', workers=population_map)
+
+        return [to_param_dict(res.x)]
+
+    def prediction_matrix(self, param_dict, syllogs=None):
+        """ Generates the mReasoner prediction matrix for a parameterization.
+
+        Parameters
+        ----------
+        param_dict : dict(str, float)
+            mReasoner parameterization.
+
+        syllogs : list(str), optional
+            Encoded syllogisms to sample. Defaults to all syllogisms. The rows of the remaining
+            syllogisms are left empty.
+
+        Returns
+        -------
+        np.ndarray
+            (64, 9) matrix of averaged prediction frequencies.
+
+        """
+
+        if syllogs is None:
+            syllogs = ccobra.syllogistic.SYLLOGISMS
+
+        samples = self.sample_predictions(syllogs, param_dict)
+        syl_idxs = [ccobra.syllogistic.SYLLOGISMS.index(x) for x in syllogs]
+        return create_cache.accumulate_predictions(
+            np.repeat(syl_idxs, self.n_samples),
+            [x for syl_samples in samples for x in syl_samples])
+
+    @staticmethod
+    def score_predictions(pred_mats, train_data):
+        """ Scores prediction matrices against the training data.
+
+        Parameters
+        ----------
+        pred_mats : np.ndarray
+            (n, 64, 9) array of prediction matrices.
+
+        train_data : np.ndarray
+            (64, 9) matrix of response frequencies.
+
+        Returns
+        -------
+        np.ndarray
+            Scores of the n prediction matrices.
+
+        """
+
+        pred_mask = (pred_mats == pred_mats.max(axis=2, keepdims=True))
+        return np.sum(np.mean(train_data * pred_mask, axis=2), axis=1)
+
+    def sample_predictions(self, syllogs, param_dict):
+        """ Samples mReasoner predictions for a list of syllogisms. Samples are memoized per
+        parameterization so that repeated fits only query mReasoner for unseen parameters.
+        Missing samples are obtained within a single mReasoner round-trip.
+
+        Parameters
+        ----------
+        syllogs : list(str)
+            Encoded syllogisms (e.g., 'AA1').
+
+        param_dict : dict(str, float)
+            mReasoner parameterization.
+
+        Returns
+        -------
+        list(list(list(str)))
+            List of n_samples prediction lists for each syllogism.
+
+        """
+
+        # Query mReasoner for the syllogisms missing in the cache
+        missing = self.missing_syllogs(syllogs, param_dict)
+        if missing:
+            premises_list = [
+                mreasoner.syllog_to_premises(x) for x in missing for _ in range(self.n_samples)]
+            responses = self.mreasoner.query_batch(premises_list, param_dict=param_dict)
+            self.store_samples(missing, param_dict, responses)
+
+        param_key = (
+            param_dict['epsilon'], param_dict['lambda'], param_dict['omega'], param_dict['sigma'])
+
+        samples = []
+        for syllog in syllogs:
+            key = param_key + (syllog,)
+            self.query_cache.move_to_end(key)
+            samples.append(self.query_cache[key])
+
+        return samples
+
+    def trim_query_cache(self):
+        """ Evicts the least recently used samples exceeding the cache size. Only called between
+        evaluations so that prefetched samples are not evicted before they are read.
+
+        """
+
+        while len(self.query_cache) > QUERY_CACHE_SIZE:
+            self.query_cache.popitem(last=False)
+
+    def missing_syllogs(self, syllogs, param_dict):
+        """ Determines the syllogisms without memoized samples for a parameterization.
+
+        Parameters
+        ----------
+        syllogs : list(str)
+            Encoded syllogisms (e.g., 'AA1').
+
+        param_dict : dict(str, float)
+            mReasoner parameterization.
+
+        Returns
+        -------
+        list(str)
+            Unique syllogisms missing in the cache.
+
+        """
+
+        param_key = (
+            param_dict['epsilon'], param_dict['lambda'], param_dict['omega'], param_dict['sigma'])
+        return [x for x in dict.fromkeys(syllogs) if param_key + (x,) not in self.query_cache]
+
+    def store_samples(self, syllogs, param_dict, responses):
+        """ Memoizes sampled mReasoner predictions.
+
+        Parameters
+        ----------
+        syllogs : list(str)
+            Encoded syllogisms (e.g., 'AA1').
+
+        param_dict : dict(str, float)
+            mReasoner parameterization.
+
+        responses : list(list(str))
+            Predictions consisting of n_samples consecutive samples per syllogism.
+
+        """
+
+        param_key = (
+            param_dict['epsilon'], param_dict['lambda'], param_dict['omega'], param_dict['sigma'])
+        for idx, syllog in enumerate(syllogs):
+            self.query_cache[param_key + (syllog,)] = \
+                responses[idx * self.n_samples:(idx + 1) * self.n_samples]
+
+    def prefetch_predictions(self, param_dicts, syllogs=None):
+        """ Samples the predictions missing in the cache for multiple parameterizations in
+        parallel by distributing them across the mReasoner worker processes.
+
+        Parameters
+        ----------
+        param_dicts : list(dict(str, float))
+            mReasoner parameterizations.
+
+        syllogs : list(str), optional
+            Encoded syllogisms to sample. Defaults to all syllogisms.
+
+        """
+
+        if syllogs is None:
+            syllogs = ccobra.syllogistic.SYLLOGISMS
+
+        # Make room for the new samples (the previously prefetched ones have been read)
+        self.trim_query_cache()
+
+        if self.n_workers <= 1:
+            return
+
+        tasks = []
+        for param_dict in param_dicts:
+            missing = self.missing_syllogs(syllogs, param_dict)
+            if missing:
+                tasks.append((param_dict, missing, self.n_samples))
+
+        if not tasks:
+            return
+
+        # Launch the worker processes which are reused across fits
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=create_cache.init_worker,
+                initargs=(self.cloz.exec_path(), self.mreas_path))
+
+        chunksize = max(1, len(tasks) // (4 * self.n_workers))
+        results = self.executor.map(create_cache.sample_worker, tasks, chunksize=chunksize)
+        for (param_dict, missing, _), responses in zip(tasks, results):
+            self.store_samples(missing, param_dict, responses)
 
     def predict(self, item, **kwargs):
         """ Queries mReasoner for a prediction.
@@ -266,12 +503,10 @@ class CCobraMReasoner(ccobra.CCobraModel):
 
         # Extract premises
         syllog = ccobra.syllogistic.Syllogism(item)
-        premises = self.syllog_to_premises(syllog.encoded_task)
 
         # Sample predictions from mReasoner
         pred_scores = np.zeros((9,))
-        for _ in range(self.n_samples):
-            predictions = self.mreasoner.query(premises, self.params)
+        for predictions in self.sample_predictions([syllog.encoded_task], self.params)[0]:
             for pred in predictions:
                 if pred not in ccobra.syllogistic.RESPONSES:
                     print('Invalid Response:', pred)
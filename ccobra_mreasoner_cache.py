@@ -15,8 +15,51 @@ import numpy as np
 import mreasoner
 import create_cache
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 logger = logging.getLogger(__name__)
 
+# Absolute tolerance below which scores are considered tied (summation order affects rounding)
+SCORE_TOLERANCE = 1e-12
+
+def _score_grid(mask, weights):
+    """ Scores the grid points by accumulating the training weights of their predictions.
+
+    Parameters
+    ----------
+    mask : np.ndarray
+        (n_points, 576) matrix indicating the predicted responses of each grid point.
+
+    weights : np.ndarray
+        (576,) training weights of the responses.
+
+    Returns
+    -------
+    np.ndarray
+        (n_points,) scores of the grid points.
+
+    """
+
+    scores = np.empty(mask.shape[0])
+    for point_idx in numba.prange(mask.shape[0]):
+        score = 0.0
+        for resp_idx in range(mask.shape[1]):
+            score += mask[point_idx, resp_idx] * weights[resp_idx]
+        scores[point_idx] = score
+    return scores
+
+# Use the parallel JIT kernel if numba is available, fall back to a BLAS product otherwise. The
+# prediction mask is stored in the dtype consumed by the kernel to avoid per-fit conversions.
+if numba is not None:
+    score_grid = numba.njit(parallel=True, cache=True)(_score_grid)
+    MASK_DTYPE = np.uint8
+else:
+    score_grid = np.dot
+    MASK_DTYPE = np.float64
+
 class CCobraMReasoner(ccobra.CCobraModel):
     """ mReasoner CCOBRA model implementation.
 
@@ -67,6 +110,11 @@ class CCobraMReasoner(ccobra.CCobraModel):
         else:
             self.prediction_cache = create_cache.generate_cache(self.fit_its, self.n_samples)
 
+        # Precompute the prediction indicators of all cached parameterizations
+        self.prediction_mask = (
+            self.prediction_cache == self.prediction_cache.max(axis=-1, keepdims=True)
+        ).reshape(-1, 64 * 9).astype(MASK_DTYPE)
+
         # Prepare mReasoner parameters
         self.params = {}
 
@@ -178,33 +226,19 @@ class CCobraMReasoner(ccobra.CCobraModel):
         train_data = self.pre_train_data
         train_data[div_mask] = history_copy[div_mask]
 
-        best_score = 0
-        best_param_dicts = []
+        # Compare the predictions of all cached parameterizations with the data
+        scores = score_grid(self.prediction_mask, train_data.ravel() / 9)
+        scores = scores.reshape(self.prediction_cache.shape[:4])
 
-        for idx_epsilon, p_epsilon in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[0], self.fit_its)):
-            for idx_lambda, p_lambda  in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[1], self.fit_its)):
-                for idx_omega, p_omega in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[2], self.fit_its)):
-                    for idx_sigma, p_sigma in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[3], self.fit_its)):
-                        param_dict = {
-                            'epsilon': (idx_epsilon, p_epsilon),
-                            'lambda': (idx_lambda, p_lambda),
-                            'omega': (idx_omega, p_omega),
-                            'sigma': (idx_sigma, p_sigma)
-                        }
-
-                        # Generate mReasoner prediction matrix
-                        pred_mat = self.prediction_cache[
-                            idx_epsilon, idx_lambda, idx_omega, idx_sigma]
-
-                        # Compare predictions with data
-                        pred_mask = (pred_mat == pred_mat.max(axis=1, keepdims=True))
-                        score = np.sum(np.mean(train_data * pred_mask, axis=1))
-
-                        if score > best_score:
-                            best_score = score
-                            best_param_dicts = [param_dict]
-                        elif score == best_score:
-                            best_param_dicts.append(param_dict)
+        param_values = [np.linspace(*bounds, self.fit_its) for bounds in mreasoner.PARAM_BOUNDS]
+        best_param_dicts = []
+        best_mask = np.isclose(scores, scores.max(), rtol=0, atol=SCORE_TOLERANCE)
+        for idxs in np.argwhere(best_mask):
+            best_param_dicts.append({
+                param: (int(idx), param_values[param_idx][idx])
+                for param_idx, (param, idx) in enumerate(
+                    zip(['epsilon', 'lambda', 'omega', 'sigma'], idxs))
+            })
 
         # Randomly select ont of the best param dicts
         self.params = best_param_dicts[int(np.random.randint(0, len(best_param_dicts)))]
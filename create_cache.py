@@ -3,7 +3,11 @@
 """
 
 import sys
+import os
 import logging
+import itertools
+import multiprocessing
+import multiprocessing.util
 
 import numpy as np
 import ccobra
@@ -11,76 +15,156 @@ import tqdm
 
 import mreasoner
 
-def syllog_to_premises(syllog):
-    template_quant = {
-        'A': 'All {} are {}',
-        'I': 'Some {} are {}',
-        'E': 'No {} are {}',
-        'O': 'Some {} are not {}'
-    }
-
-    template_fig = {
-        '1': [['A', 'B'], ['B', 'C']],
-        '2': [['B', 'A'], ['C', 'B']],
-        '3': [['A', 'B'], ['C', 'B']],
-        '4': [['B', 'A'], ['B', 'C']]
-    }
-
-    prem1 = template_quant[syllog[0]].format(*template_fig[syllog[-1]][0])
-    prem2 = template_quant[syllog[1]].format(*template_fig[syllog[-1]][1])
-    return [prem1, prem2]
-
-def generate_cache(fit_its, n_samples):
-    # Initialize mReasoner interface
+RESPONSE_IDXS = {resp: idx for idx, resp in enumerate(ccobra.syllogistic.RESPONSES)}
+
+# Worker-local mReasoner instance of the process pool
+_WORKER_MR = None
+
+def init_worker(ccl_path, mreas_path):
+    """ Initializes a pool worker by launching its own mReasoner instance.
+
+    """
+
+    global _WORKER_MR
+    _WORKER_MR = mreasoner.MReasoner(ccl_path, mreas_path)
+    multiprocessing.util.Finalize(_WORKER_MR, _WORKER_MR.terminate, exitpriority=10)
+
+def predict_worker(task):
+    """ Computes the prediction matrices of a chunk of grid points on the worker-local mReasoner
+    instance.
+
+    """
+
+    idxs_list, param_dicts, n_samples = task
+    return idxs_list, predict_matrices(_WORKER_MR, param_dicts, n_samples)
+
+def sample_worker(task):
+    """ Samples predictions for a list of syllogisms on the worker-local mReasoner instance.
+
+    """
+
+    param_dict, syllogs, n_samples = task
+    premises_list = [mreasoner.syllog_to_premises(x) for x in syllogs for _ in range(n_samples)]
+    return _WORKER_MR.query_batch(premises_list, param_dict=param_dict)
+
+def predict_matrices(mr, param_dicts, n_samples):
+    """ Queries mReasoner for the predictions on all syllogisms under multiple parameterizations
+    within a single round-trip.
+
+    Parameters
+    ----------
+    mr : mreasoner.MReasoner
+        mReasoner instance to query.
+
+    param_dicts : list(dict(str, float))
+        mReasoner parameterizations.
+
+    n_samples : int
+        Number of samples to draw per syllogism.
+
+    Returns
+    -------
+    list(np.ndarray)
+        (64, 9) matrices of averaged prediction frequencies.
+
+    """
+
+    # Query all syllogisms and samples for all parameterizations within a single round-trip
+    syllogs = [syllog for syllog in ccobra.syllogistic.SYLLOGISMS for _ in range(n_samples)]
+    sweep = mr.query_sweep(param_dicts, [mreasoner.syllog_to_premises(x) for x in syllogs])
+
+    pred_mats = []
+    for param_dict, responses in zip(param_dicts, sweep):
+        for syllog, predictions in zip(syllogs, responses):
+            if not predictions:
+                print(syllog, str({x: y for x, y in param_dict.items()}))
+
+        pred_mats.append(accumulate_predictions(np.repeat(np.arange(64), n_samples), responses))
+
+    return pred_mats
+
+def accumulate_predictions(syl_idxs, responses):
+    """ Accumulates sampled mReasoner predictions into a prediction matrix. Each sample
+    distributes a unit weight across its predicted responses.
+
+    Parameters
+    ----------
+    syl_idxs : np.ndarray
+        Syllogism index of each sample.
+
+    responses : list(list(str))
+        Predicted responses of each sample.
+
+    Returns
+    -------
+    np.ndarray
+        (64, 9) matrix of averaged prediction frequencies.
+
+    """
+
+    rows, cols, weights = [], [], []
+    for syl_idx, predictions in zip(syl_idxs, responses):
+        if not predictions:
+            continue
+
+        resp_idxs = [RESPONSE_IDXS[x] for x in predictions if x in RESPONSE_IDXS]
+        rows.extend([syl_idx] * len(resp_idxs))
+        cols.extend(resp_idxs)
+        weights.extend([1 / len(predictions)] * len(resp_idxs))
+
+    pred_mat = np.zeros((64, 9))
+    np.add.at(pred_mat, (rows, cols), weights)
+    return pred_mat
+
+def generate_cache(fit_its, n_samples, n_workers=None):
+    # Initialize mReasoner sources once before spawning the workers
     cloz = mreasoner.ClozureCL()
     mreas_path = mreasoner.source_path()
-    mr = mreasoner.MReasoner(cloz.exec_path(), mreas_path)
+    mreasoner.ensure_image(cloz.exec_path(), mreas_path)
+
+    n_workers = min(n_workers or os.cpu_count() or 1, os.cpu_count() or 1)
+
+    # Prepare the parameter grid in chunks sweeping the innermost parameter
+    chunks = []
+    param_values = [np.linspace(*bounds, fit_its) for bounds in mreasoner.PARAM_BOUNDS]
+    for outer_idxs in itertools.product(range(fit_its), repeat=3):
+        idxs_list = [outer_idxs + (idx,) for idx in range(fit_its)]
+        param_dicts = [
+            {param: values[idx] for param, values, idx in zip(
+                ['epsilon', 'lambda', 'omega', 'sigma'], param_values, idxs)}
+            for idxs in idxs_list]
+        chunks.append((idxs_list, param_dicts, n_samples))
 
     # Generate predictions
-    cache = None
-    with tqdm.tqdm(total=fit_its ** 4) as pbar:
-        cache = np.zeros((fit_its, fit_its, fit_its, fit_its, 64, 9))
-        for idx_epsilon, p_epsilon in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[0], fit_its)):
-            for idx_lambda, p_lambda  in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[1], fit_its)):
-                for idx_omega, p_omega in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[2], fit_its)):
-                    for idx_sigma, p_sigma in enumerate(np.linspace(*mreasoner.PARAM_BOUNDS[3], fit_its)):
-                        #progress = (idx_epsilon * (fit_its ** 3) + idx_lambda * (fit_its ** 2) + idx_omega * (fit_its) + idx_sigma)
-                        #print('Current progress: {:.2f}%'.format(progress * 100))
-
-                        param_dict = {
-                            'epsilon': p_epsilon,
-                            'lambda': p_lambda,
-                            'omega': p_omega,
-                            'sigma': p_sigma
-                        }
-
-                        # Generate mReasoner prediction matrix
-                        pred_mat = np.zeros((64, 9))
-                        for syl_idx, syllog in enumerate(ccobra.syllogistic.SYLLOGISMS):
-                            premises = syllog_to_premises(syllog)
-
-                            for _ in range(n_samples):
-                                # Obtain mReasoner prediction
-                                predictions = mr.query(premises, param_dict=param_dict)
-                                if not predictions:
-                                    print(syllog, str({x: y for x, y in param_dict.items()}))
-                                for pred in predictions:
-                                    if pred in ccobra.syllogistic.RESPONSES:
-                                        pred_mat[syl_idx, ccobra.syllogistic.RESPONSES.index(pred)] += 1 / len(predictions)
-
-                        cache[idx_epsilon, idx_lambda, idx_omega, idx_sigma] = pred_mat
-
-                        # Update progress
-                        pbar.update(1)
-
-    mr.terminate()
+    cache = np.zeros((fit_its, fit_its, fit_its, fit_its, 64, 9))
+    pool = multiprocessing.Pool(
+        n_workers, initializer=init_worker, initargs=(cloz.exec_path(), mreas_path))
+    try:
+        chunksize = max(1, len(chunks) // (4 * n_workers))
+        with tqdm.tqdm(total=fit_its ** 4) as pbar:
+            results = pool.imap_unordered(predict_worker, chunks, chunksize=chunksize)
+            for idxs_list, pred_mats in results:
+                for idxs, pred_mat in zip(idxs_list, pred_mats):
+                    cache[idxs] = pred_mat
+
+                # Update progress
+                pbar.update(len(idxs_list))
+
+        # Shut down the workers gracefully to terminate their mReasoner instances
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
     return cache
 
 if __name__ == '__main__':
 
 
-    if len(sys.argv) != 4:
-        print('usage: python create_cache.py <fit_its> <n_samples> <out_file>')
+    if len(sys.argv) not in [4, 5]:
+        print('usage: python create_cache.py <fit_its> <n_samples> <out_file> [<n_workers>]')
         exit()
 
     logging.basicConfig(level=logging.INFO)
@@ -88,6 +172,7 @@ if __name__ == '__main__':
     fit_its = int(sys.argv[1])
     n_samples = int(sys.argv[2])
     out_file = sys.argv[3]
+    n_workers = int(sys.argv[4]) if len(sys.argv) == 5 else None
 
-    cache = generate_cache(fit_its, n_samples)
+    cache = generate_cache(fit_its, n_samples, n_workers)
     np.save(out_file, cache)
@@ -3,7 +3,8 @@ implementation.
 
 """
 
-from .mreasoner import MReasoner, source_path, DEFAULT_PARAMS, PARAM_BOUNDS
+from .mreasoner import MReasoner, source_path, ensure_image, syllog_to_premises, \
+    DEFAULT_PARAMS, PARAM_BOUNDS
 from .clozure import ClozureCL
 
 __version__ = '0.1'
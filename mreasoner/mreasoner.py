@@ -2,15 +2,21 @@
 
 """
 
+import collections
 import copy
+import functools
+import hashlib
+import io
 import logging
 import os
+import pathlib
 import platform
 import queue
+import re
+import selectors
 import subprocess
-import multiprocessing
+import threading
 import time
-import select
 
 import urllib.request
 import zipfile
@@ -18,6 +24,11 @@ import zipfile
 import numpy as np
 import scipy.optimize as so
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 FASL_ENDINGS = {
     'Darwin': 'dx64fsl',
@@ -34,8 +45,239 @@ DEFAULT_PARAMS = {
 
 PARAM_BOUNDS = [[0.0, 1.0], [0.1, 8.0], [0.0, 1.0], [0.0, 1.0]]
 
+# Pipe buffer size for the communication with the CCL subprocess (Linux only)
+F_SETPIPE_SZ = 1031
+PIPE_SIZE = 1 << 20
+
+TEMPLATE_QUANT = {
+    'A': 'All {} are {}',
+    'I': 'Some {} are {}',
+    'E': 'No {} are {}',
+    'O': 'Some {} are not {}'
+}
+
+TEMPLATE_FIG = {
+    '1': [['A', 'B'], ['B', 'C']],
+    '2': [['B', 'A'], ['C', 'B']],
+    '3': [['A', 'B'], ['C', 'B']],
+    '4': [['B', 'A'], ['B', 'C']]
+}
+
+# Premises of all 64 syllogisms
+PREMISES = {
+    quant1 + quant2 + fig: (
+        TEMPLATE_QUANT[quant1].format(*TEMPLATE_FIG[fig][0]),
+        TEMPLATE_QUANT[quant2].format(*TEMPLATE_FIG[fig][1]))
+    for quant1 in 'AIEO' for quant2 in 'AIEO' for fig in '1234'
+}
+
+def syllog_to_premises(syllog):
+    """ Constructs the premises of a syllogism.
+
+    Parameters
+    ----------
+    syllog : str
+        Encoded syllogism (e.g., 'AA1').
+
+    Returns
+    -------
+    tuple(str, str)
+        Premises of the syllogism (e.g., ('All A are B', 'All B are C')).
+
+    """
+
+    return PREMISES[syllog]
+
+# Pre-encoded command templates for the hot paths
+SETF_TEMPLATES = {
+    param: '(setf +{}+ %r)'.format(param).encode('ascii') for param in DEFAULT_PARAMS}
+
+QUERY_TEMPLATE = '\n'.join([
+    "(progn",
+    "    (initialize-tracer)",
+    "    (reset-tracer)",
+    "    (let* ((premise-intensions (list (parse '({})) (parse '({})))))",
+    "        (what-follows? premise-intensions)",
+    "        (third (first (trace-output *tracer*)))",
+    "    )",
+    ")",
+])
+
+BATCH_PREFIX, BATCH_SUFFIX = '\n'.join([
+    "(progn",
+    "    (let ((responses (mapcar (lambda (premises)",
+    "                               (write-char #\\.)",
+    "                               (finish-output)",
+    "                               (initialize-tracer)",
+    "                               (reset-tracer)",
+    "                               (what-follows? (list (parse (first premises)) (parse (second premises))))",
+    "                               (third (first (trace-output *tracer*))))",
+    "                             '({}))))",
+    "        (prin1 \"RESULT\")",
+    "        (terpri)",
+    "        (let ((*print-pretty* nil))",
+    "            (prin1 responses))",
+    "        (terpri)",
+    "        (values)",
+    "    )",
+    ")",
+]).encode('ascii').split(b'{}')
+
+SWEEP_PREFIX, SWEEP_INFIX, SWEEP_SUFFIX = '\n'.join([
+    "(progn",
+    "    (let ((responses (loop for (e l o s) in '({})",
+    "                           collect (progn",
+    "                                     (setf +epsilon+ e +lambda+ l +omega+ o +sigma+ s)",
+    "                                     (mapcar (lambda (premises)",
+    "                                               (write-char #\\.)",
+    "                                               (finish-output)",
+    "                                               (initialize-tracer)",
+    "                                               (reset-tracer)",
+    "                                               (what-follows? (list (parse (first premises)) (parse (second premises))))",
+    "                                               (third (first (trace-output *tracer*))))",
+    "                                             '({}))))))",
+    "        (prin1 \"RESULT\")",
+    "        (terpri)",
+    "        (let ((*print-pretty* nil))",
+    "            (prin1 responses))",
+    "        (terpri)",
+    "        (values)",
+    "    )",
+    ")",
+]).encode('ascii').split(b'{}')
+
+QUERY_FORMS = {x: QUERY_TEMPLATE.format(*x).encode('ascii') for x in PREMISES.values()}
+
+TASK_FORMS = {x: '(({}) ({}))'.format(*x).encode('ascii') for x in PREMISES.values()}
+
+def query_form(premises):
+    """ Returns the encoded query command for a premise pair.
+
+    """
+
+    premises = tuple(premises)
+    form = QUERY_FORMS.get(premises)
+    if form is None:
+        form = QUERY_TEMPLATE.format(*premises).encode('ascii')
+    return form
+
+def task_form(premises):
+    """ Returns the encoded LISP literal of a premise pair for batch queries.
+
+    """
+
+    premises = tuple(premises)
+    form = TASK_FORMS.get(premises)
+    if form is None:
+        form = '(({}) ({}))'.format(*premises).encode('ascii')
+    return form
+
+SEXPR_SYNTAX = re.compile(rb'[()"\\]')
+
+SEXPR_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+def scan_sexpr(buf, pos, depth, in_string):
+    """ Incrementally scans a buffer for the end of an s-expression.
+
+    Parameters
+    ----------
+    buf : bytes or bytearray
+        Buffer starting with the s-expression.
+
+    pos : int
+        Position to resume scanning from.
+
+    depth : int
+        Parenthesis depth at the resume position.
+
+    in_string : bool
+        Whether the resume position lies within a string literal.
+
+    Returns
+    -------
+    tuple(int, int, int, bool)
+        End index of the s-expression (-1 if incomplete) and the scanner state (pos, depth,
+        in_string) to resume from once more data is available.
+
+    """
+
+    while True:
+        match = SEXPR_SYNTAX.search(buf, pos)
+        if match is None:
+            return -1, len(buf), depth, in_string
+
+        char = match.group()
+        idx = match.start()
+        if char == b'\\':
+            # Escaped character, rescan once the escaped character is available
+            if idx + 1 >= len(buf):
+                return -1, idx, depth, in_string
+            pos = idx + 2
+            continue
+
+        pos = idx + 1
+        if char == b'"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == b'(':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos, pos, depth, in_string
+
+def parse_sexpr(text):
+    """ Parses a printed LISP s-expression into nested lists of strings.
+
+    Parameters
+    ----------
+    text : str
+        Printed s-expression.
+
+    Returns
+    -------
+    list or str
+        Nested lists containing strings and atoms (as strings).
+
+    Raises
+    ------
+    ValueError
+        If the text is not a single complete s-expression.
+
+    """
+
+    stack = [[]]
+    text = text.strip()
+    pos = 0
+    while pos < len(text):
+        match = SEXPR_TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError('Invalid s-expression: "{}"'.format(text))
+        pos = match.end()
+
+        lpar, rpar, string, atom = match.groups()
+        if lpar:
+            stack.append([])
+        elif rpar:
+            if len(stack) < 2:
+                raise ValueError('Unbalanced s-expression: "{}"'.format(text))
+            expr = stack.pop()
+            stack[-1].append(expr)
+        elif string is not None:
+            stack[-1].append(re.sub(r'\\(.)', r'\1', string))
+        else:
+            stack[-1].append(atom)
+
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise ValueError('Incomplete s-expression: "{}"'.format(text))
+
+    return stack[0][0]
+
+@functools.lru_cache(maxsize=1)
 def source_path(mreas_path='.mreasoner'):
     """ Determines the source path of mReasoner if existent. Downloads a copy if necessary.
+    The result is memoized per process.
 
     Parameters
     ----------
@@ -49,27 +291,109 @@ def source_path(mreas_path='.mreasoner'):
 
     """
 
-    if not os.path.exists(mreas_path):
+    mreas_path = pathlib.Path(mreas_path)
+    if not mreas_path.exists():
         # Create the mreasoner directory
-        os.mkdir(mreas_path)
+        mreas_path.mkdir()
 
-        # Download the mreasoner source
+        # Download the mreasoner source and unzip it in memory
         link = 'https://github.com/nriesterer/pymreasoner/raw/master/mReasoner-2587fda.zip'
-        dl_target = mreas_path + os.sep + 'mReasoner.zip'
-        urllib.request.urlretrieve(link, dl_target)
+        with urllib.request.urlopen(link) as response:
+            archive = io.BytesIO(response.read())
 
-        # Unzip content
-        with zipfile.ZipFile(dl_target, 'r') as zip_ref:
+        with zipfile.ZipFile(archive, 'r') as zip_ref:
             zip_ref.extractall(mreas_path)
 
     # Look for mReasoner directory
-    for name in os.listdir(mreas_path):
-        path = mreas_path + os.sep + name
-        if not os.path.isdir(path) or name.startswith('_'):
+    source_dir = mreas_path
+    for path in mreas_path.iterdir():
+        if not path.is_dir() or path.name.startswith('_'):
             continue
-        mreas_path = path
+        source_dir = path
 
-    return mreas_path
+    return str(source_dir)
+
+def ensure_image(ccl_path, mreasoner_dir):
+    """ Builds a Clozure Common LISP heap image with mReasoner preloaded unless it already exists.
+    Subprocesses started from the image skip loading the mReasoner sources. Images are specific
+    to the CCL kernel which built them and are therefore named after it. Concurrent calls
+    (e.g., from parallel workers) are serialized by locking the source directory so that the
+    image is only built once.
+
+    Parameters
+    ----------
+    ccl_path : str
+        Path to the Clozure Common LISP executable.
+
+    mreasoner_dir : str
+        Path to the mReasoner source code directory.
+
+    Returns
+    -------
+    str
+        Path to the heap image or None if it could not be built.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    # Identify the kernel by its location and file metadata (changes on upgrades)
+    try:
+        kernel_stat = os.stat(ccl_path)
+    except OSError as exc:
+        logger.warning('CCL kernel unavailable: %s', exc)
+        return None
+
+    kernel_id = hashlib.md5('{}:{}:{}'.format(
+        os.path.realpath(ccl_path), kernel_stat.st_size, kernel_stat.st_mtime_ns
+    ).encode('utf-8')).hexdigest()[:8]
+
+    image_path = str(pathlib.Path(mreasoner_dir) / 'mReasoner-{}-{}.image'.format(
+        FASL_ENDINGS[platform.system()], kernel_id))
+    if os.path.exists(image_path):
+        return image_path
+
+    lock_fd = None
+    if fcntl is not None:
+        lock_fd = os.open(mreasoner_dir, os.O_RDONLY)
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+
+    try:
+        # Another process might have built the image in the meantime
+        if os.path.exists(image_path):
+            return image_path
+
+        logger.info('Building mReasoner image "%s"...', image_path)
+        tmp_path = image_path + '.tmp'
+        mreasoner_file = str(pathlib.Path(mreasoner_dir) / '+mReasoner.lisp')
+        try:
+            subprocess.run(
+                [
+                    ccl_path, '--batch', '--load', mreasoner_file,
+                    '--eval', '(ccl:save-application "{}")'.format(tmp_path.replace('\\', '/'))
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=600
+            )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            logger.warning('Building the mReasoner image failed: %s', exc)
+
+            # Remove partially written images
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if not os.path.exists(tmp_path):
+            logger.warning('mReasoner image unavailable. Falling back to loading the sources.')
+            return None
+
+        os.replace(tmp_path, image_path)
+        return image_path
+    finally:
+        # Closing the descriptor releases the lock
+        if lock_fd is not None:
+            os.close(lock_fd)
 
 class MReasoner():
     """ LISP mReasoner wrapper. Executes a Clozure Common LISP subprocess to run an unmodified
@@ -78,6 +402,10 @@ class MReasoner():
 
     """
 
+    # Heap image paths determined per (ccl_path, mreasoner_dir) within this process
+    _image_paths = {}
+    _image_lock = threading.Lock()
+
     def __init__(self, ccl_path, mreasoner_dir):
         """ Constructs the mReasoner instance by launching the LISP subprocess.
 
@@ -98,6 +426,13 @@ class MReasoner():
         self.ccl_path = ccl_path
         self.mreasoner_dir = mreasoner_dir
 
+        # Build the preloaded mReasoner image (filesystem checks are only performed once)
+        with MReasoner._image_lock:
+            key = (ccl_path, mreasoner_dir)
+            if key not in MReasoner._image_paths:
+                MReasoner._image_paths[key] = ensure_image(ccl_path, mreasoner_dir)
+            self.image_path = MReasoner._image_paths[key]
+
         # Initialize mReasoner instance
         self.proc = None
         self.initialize()
@@ -105,70 +440,327 @@ class MReasoner():
     def initialize(self):
         self.logger.info('Initializing mReasoner')
 
-        # Load mReasoner in CCL environment
-        mreasoner_file = self.mreasoner_dir + os.sep + "+mReasoner.lisp"
+        # Start CCL from the preloaded image or load mReasoner in the CCL environment
+        if self.image_path is not None:
+            args = [self.ccl_path, '--image-name', self.image_path]
+        else:
+            mreasoner_file = pathlib.Path(self.mreasoner_dir) / '+mReasoner.lisp'
+            args = [self.ccl_path, '--load', str(mreasoner_file)]
 
         # Start mReasoner process
         self.proc = subprocess.Popen(
-            [self.ccl_path, '--load', mreasoner_file],
+            args,
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT
         )
 
-        out = self.wait_for_output('Licence, Version 2.0.', timeout=10)
-        assert out == 'Licence, Version 2.0.'
+        # Enlarge the pipe buffers
+        if fcntl is not None and platform.system() == 'Linux':
+            for pipe in [self.proc.stdin, self.proc.stdout]:
+                try:
+                    fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, PIPE_SIZE)
+                except OSError as exc:
+                    self.logger.debug('Pipe buffer could not be enlarged: %s', exc)
+
+        # Prepare the output framing state. Pipes are only selectable on POSIX systems, on
+        # Windows a reader thread hands over the output chunks instead.
+        self.out_items = collections.deque()
+        self.out_buf = bytearray()
+        self.out_collecting = False
+        self.out_scan = (0, 0, False)
+        self.selector = None
+        self.out_chunks = None
+        if platform.system() != 'Windows':
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.proc.stdout, selectors.EVENT_READ)
+        else:
+            self.out_chunks = queue.Queue()
+            reader = threading.Thread(
+                target=self.stdout_reader, args=(self.proc, self.out_chunks), daemon=True)
+            reader.start()
+
+        # Wait until the REPL is ready (i.e., mReasoner is loaded)
+        try:
+            self._send('(progn (prin1 "INITIALIZED") (terpri) (values))')
+            out = self.wait_for_output('"INITIALIZED"', timeout=60)
+        except OSError:
+            out = None
+
+        # Images incompatible with the kernel fail to start. Fall back to loading the sources.
+        if out is None and self.image_path is not None:
+            self.logger.warning(
+                'mReasoner image "%s" failed to start. Falling back to loading the sources.',
+                self.image_path)
+            self.terminate()
+            with MReasoner._image_lock:
+                MReasoner._image_paths[(self.ccl_path, self.mreasoner_dir)] = None
+            self.image_path = None
+            return self.initialize()
+
+        assert out is not None, 'mReasoner initialization failed'
+
+        # Enable the stochastic mode and reset the parameter bookkeeping of the fresh instance
+        self._send('(setf *stochastic* T)')
+        self.params = {}
+
+    @staticmethod
+    def stdout_reader(proc, out_chunks):
+        """ Reads the output of the Clozure Common LISP subprocess in large chunks and hands it
+        over to the consumer. Used on systems on which pipes cannot be selected.
+
+        Parameters
+        ----------
+        proc : subprocess.Popen
+            Clozure Common LISP subprocess.
+
+        out_chunks : queue.Queue
+            Queue receiving the output chunks. An empty chunk signals the end of the stream.
+
+        """
+
+        while True:
+            try:
+                chunk = os.read(proc.stdout.fileno(), 65536)
+            except OSError:
+                chunk = b''
+
+            out_chunks.put(chunk)
+            if not chunk:
+                break
+
+    def _emit(self, kind, data):
+        """ Queues an item framed from the subprocess output.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of the item ('line' or 'result').
+
+        data : bytes
+            Content of the item.
+
+        """
+
+        # Only decode the output for logging if it is enabled
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Read:%s', data.decode('ascii', errors='replace'))
+        self.out_items.append((kind, data))
+
+    def _process_output(self, chunk):
+        """ Frames a chunk of the subprocess output into items using a bytes-level state machine.
+        While scanning, the output is split into lines and comment lines are dropped without
+        being decoded. A line containing the "RESULT" marker switches to collecting, which
+        gathers the following s-expression until its parentheses are balanced and queues it as a
+        single item.
+
+        Parameters
+        ----------
+        chunk : bytes
+            Output chunk read from the subprocess. An empty chunk signals the end of the stream.
+
+        """
+
+        buf = self.out_buf
+        buf += chunk
+
+        # Flush the remaining output at the end of the stream
+        if not chunk:
+            if buf.strip() and not self.out_collecting:
+                self._emit('line', bytes(buf).strip())
+            buf.clear()
+            self.out_items.append(None)
+            return
+
+        pos, depth, in_string = self.out_scan
+        while True:
+            if self.out_collecting:
+                # Skip the whitespace preceding the s-expression
+                if depth == 0:
+                    start = len(buf) - len(buf.lstrip())
+                    if start == len(buf):
+                        break
+
+                    # Atoms (e.g., NIL) end with the line
+                    if buf[start:start + 1] != b'(':
+                        end = buf.find(b'\n', start)
+                        if end < 0:
+                            break
+                        self._emit('result', bytes(buf[start:end]).strip())
+                        del buf[:end + 1]
+                        self.out_collecting = False
+                        continue
+
+                    del buf[:start]
+                    pos = 0
+
+                end, pos, depth, in_string = scan_sexpr(buf, pos, depth, in_string)
+                if end < 0:
+                    break
+
+                self._emit('result', bytes(buf[:end]))
+                del buf[:end]
+                self.out_collecting = False
+                pos, depth, in_string = 0, 0, False
+                continue
+
+            end = buf.find(b'\n')
+            if end < 0:
+                break
+            line = bytes(buf[:end]).strip()
+            del buf[:end + 1]
+
+            # Skip LISP comments (e.g., compiler notes)
+            if line.startswith(b';'):
+                continue
+
+            # Collect the s-expression following the result marker line
+            if b'"RESULT"' in line:
+                self.out_collecting = True
+                continue
+
+            self._emit('line', line)
+        self.out_scan = (pos, depth, in_string)
+
+    def _next_item(self, deadline, idle_timeout=None):
+        """ Retrieves the next item framed from the subprocess output. Reads from the subprocess
+        until an item is available.
+
+        Parameters
+        ----------
+        deadline : float
+            Point in time until which to wait for an item.
+
+        idle_timeout : float, optional
+            If set, the deadline is postponed by this many seconds whenever output arrives.
+
+        Returns
+        -------
+        tuple(str, bytes)
+            Kind and content of the item or None if a timeout occurred or the subprocess
+            terminated.
+
+        """
+
+        while not self.out_items:
+            # Wait for the subprocess output to become available
+            if self.selector is not None:
+                if not self.selector.select(timeout=max(0, deadline - time.time())):
+                    self.logger.warning('Timeout occurred.')
+                    return None
+                chunk = os.read(self.proc.stdout.fileno(), 65536)
+            else:
+                try:
+                    chunk = self.out_chunks.get(timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    self.logger.warning('Timeout occurred.')
+                    return None
+
+            self._process_output(chunk)
+            if idle_timeout is not None:
+                deadline = time.time() + idle_timeout
+
+        item = self.out_items.popleft()
+        if item is None:
+            # Keep reporting the end of the stream
+            self.out_items.append(None)
+            self.logger.warning('mReasoner subprocess terminated.')
+
+        return item
 
     def wait_for_output(self, text, timeout=10):
-        manager = multiprocessing.Manager()
-        result_list = manager.list()
-
-        def worker(proc):
-            logger = logging.getLogger(__name__ + '-worker')
-            while True:
-                line = proc.stdout.readline().decode('ascii').strip()
-                logger.debug('Read:%s', line)
-
-                if text in line:
-                    result_list.append(line)
-                    return
-
-        th = multiprocessing.Process(target=worker, args=(self.proc,), daemon=True)
-        th.start()
-        th.join(timeout=20)
-
-        if th.is_alive():
-            self.logger.warn('Timeout occurred.')
-            th.terminate()
-            return None
+        """ Waits for an output line of the subprocess containing the given text.
+
+        Parameters
+        ----------
+        text : str
+            Text to look for.
+
+        timeout : float, optional
+            Maximum time in seconds to wait for the output.
+
+        Returns
+        -------
+        str
+            Output line containing the text or None if a timeout occurred.
+
+        """
+
+        needle = text.encode('ascii')
+        deadline = time.time() + timeout
+        while True:
+            item = self._next_item(deadline)
+            if item is None:
+                return None
+
+            kind, data = item
+            if kind == 'line' and needle in data:
+                return data.decode('ascii', errors='replace')
+
+    def wait_for_result(self, timeout=10):
+        """ Waits for a result s-expression of the subprocess. Results are announced by a line
+        containing the "RESULT" marker and may span multiple output lines. Batched queries print
+        a progress character per task, so the timeout only expires if the subprocess stalls.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time in seconds to wait without receiving any output.
+
+        Returns
+        -------
+        list
+            Parsed result s-expression or None if a timeout occurred.
+
+        """
+
+        while True:
+            item = self._next_item(time.time() + timeout, idle_timeout=timeout)
+            if item is None:
+                return None
+
+            kind, data = item
+            if kind == 'result':
+                return parse_sexpr(data.decode('ascii', errors='replace'))
 
-        return result_list[0]
+    def _param_cmds(self, param_dict):
+        """ Prepares the commands setting the parameters which differ from the values currently
+        set in the LISP environment.
+
+        Parameters
+        ----------
+        param_dict : dict(str, float)
+            mReasoner parameterization.
+
+        Returns
+        -------
+        list(bytes)
+            Encoded commands to send.
+
+        """
+
+        cmds = []
+        for param, value in param_dict.items():
+            if self.params.get(param) == value:
+                continue
+
+            template = SETF_TEMPLATES.get(param)
+            if template is None:
+                template = '(setf +{}+ %r)'.format(param).encode('ascii')
+            cmds.append(template % float(value))
+            self.params[param] = value
+
+        return cmds
 
     def query(self, premises, param_dict=None):
         if param_dict == None:
             param_dict = DEFAULT_PARAMS
 
         # Prepare the command
-        cmd = [
-            "(progn",
-            "    (initialize-tracer)",
-            "    (reset-tracer)",
-            "    (let* ((premise-intensions (list (parse '({})) (parse '({})))))".format(premises[0], premises[1]),
-            "        (setf *stochastic* T)",
-            "        (setf +sigma+ {})".format(param_dict['sigma']),
-            "        (setf +lambda+ {})".format(param_dict['lambda']),
-            "        (setf +epsilon+ {})".format(param_dict['epsilon']),
-            "        (setf +omega+ {})".format(param_dict['omega']),
-            "        (what-follows? premise-intensions)",
-            "        (third (first (trace-output *tracer*)))",
-            "    )",
-            ")",
-        ]
-
-        cmd = '\n'.join(cmd)
+        cmd = query_form(premises)
 
         # Send the query command and wait for the output line
-        self._send(cmd)
+        self._send_many(self._param_cmds(param_dict) + [cmd])
         out = self.wait_for_output('Conclusion: ', timeout=10)
         self.logger.debug('Output line received: %s', out)
 
@@ -194,6 +786,124 @@ class MReasoner():
 
         return predictions
 
+    def query_batch(self, premises_list, param_dict=None):
+        """ Queries mReasoner for multiple premise pairs within a single LISP round-trip.
+
+        Parameters
+        ----------
+        premises_list : list(list(str))
+            List of premise pairs to query.
+
+        param_dict : dict(str, float), optional
+            mReasoner parameterization.
+
+        Returns
+        -------
+        list(list(str))
+            Predictions for each of the premise pairs.
+
+        """
+
+        if param_dict == None:
+            param_dict = DEFAULT_PARAMS
+
+        # Prepare the command
+        cmd = BATCH_PREFIX + b' '.join([task_form(x) for x in premises_list]) + BATCH_SUFFIX
+
+        # Send the query command and wait for the result
+        self._send_many(self._param_cmds(param_dict) + [cmd])
+        result = self.wait_for_result(timeout=10)
+
+        # Catch timeout in wait_for_result
+        if result is None:
+            self.logger.warning('Timeout in batch query detected with params "%s"', param_dict)
+
+            # Reinitialize current mReasoner instance
+            self.terminate()
+            self.initialize()
+
+            # Try again
+            return self.query_batch(premises_list, param_dict=param_dict)
+
+        return self._extract_predictions(result, param_dict)
+
+    def query_sweep(self, param_dicts, premises_list):
+        """ Queries mReasoner for multiple premise pairs under multiple parameterizations within a
+        single LISP round-trip. The parameter sweep is performed inside the LISP session.
+
+        Parameters
+        ----------
+        param_dicts : list(dict(str, float))
+            mReasoner parameterizations.
+
+        premises_list : list(list(str))
+            List of premise pairs to query.
+
+        Returns
+        -------
+        list(list(list(str)))
+            Predictions for each of the premise pairs for each parameterization.
+
+        """
+
+        # Prepare the command
+        params = b' '.join([
+            b'(%r %r %r %r)' % tuple(
+                float(x[param]) for param in ['epsilon', 'lambda', 'omega', 'sigma'])
+            for x in param_dicts])
+        tasks = b' '.join([task_form(x) for x in premises_list])
+        cmd = SWEEP_PREFIX + params + SWEEP_INFIX + tasks + SWEEP_SUFFIX
+
+        # Send the query command and wait for the result
+        self._send_many([cmd])
+        result = self.wait_for_result(timeout=10)
+
+        # Catch timeout in wait_for_result
+        if result is None:
+            self.logger.warning('Timeout in sweep query detected with params "%s"', param_dicts)
+
+            # Reinitialize current mReasoner instance
+            self.terminate()
+            self.initialize()
+
+            # Try again
+            return self.query_sweep(param_dicts, premises_list)
+
+        # The LISP environment keeps the last parameterization of the sweep
+        if param_dicts:
+            self.params = dict(param_dicts[-1])
+
+        return [self._extract_predictions(x, y) for x, y in zip(result, param_dicts)]
+
+    def _extract_predictions(self, responses, param_dict):
+        """ Extracts the predictions from the conclusion traces returned by a batch query.
+
+        Parameters
+        ----------
+        responses : list(str)
+            Conclusion traces (e.g., 'Conclusion: Iac, Ica').
+
+        param_dict : dict(str, float)
+            mReasoner parameterization used for the query.
+
+        Returns
+        -------
+        list(list(str))
+            Predictions for each of the responses.
+
+        """
+
+        predictions = []
+        for response in responses:
+            preds = []
+            if isinstance(response, str) and response.startswith('Conclusion: '):
+                preds = [x for x in response[12:].split(', ') if len(x) > 0]
+            if not preds:
+                self.logger.warning('Empty predictions:%s', param_dict)
+            predictions.append(preds)
+
+        return predictions
+
     def _send(self, cmd):
         """ Send a command to the Clozure Common LISP subprocess.
 
@@ -208,14 +918,39 @@ class MReasoner():
         cmd.strip()
 
         self.logger.debug('Send:%s', cmd)
+
         self.proc.stdin.write('{}\n'.format(cmd).encode('ascii'))
         self.proc.stdin.flush()
 
+    def _send_many(self, cmds):
+        """ Send multiple commands to the Clozure Common LISP subprocess within a single write.
+
+        Parameters
+        ----------
+        cmds : list(bytes)
+            Encoded commands to send.
+
+        """
+
+        # Only decode the commands for logging if it is enabled
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for cmd in cmds:
+                self.logger.debug('Send:%s', cmd.decode('ascii'))
+
+        self.proc.stdin.write(b'\n'.join(cmds) + b'\n')
+        self.proc.stdin.flush()
+
     def terminate(self):
         """ Terminate mReasoner and its parent instance of Clozure Common LISP.
 
         """
 
-        # Terminate Clozure
-        self._send('(quit)')
+        # Terminate Clozure (the subprocess might already have exited)
+        try:
+            self._send('(quit)')
+        except OSError:
+            pass
         self.proc.kill()
+
+        if self.selector is not None:
+            self.selector.close()